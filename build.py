@@ -1,64 +1,98 @@
 #!/usr/bin/env python3
 """
-Build script for Truedat - creates a single-file executable using PyInstaller.
+Build script for Truedat - creates one-folder executables using PyInstaller.
 
 Usage:
-    python build.py
+    python build.py              # truedat-analyze (default)
+    python build.py visualize    # truedat-visualize (optional mood map viewer)
 
 Output:
-    dist/truedat.exe (Windows) or dist/truedat (Linux/Mac)
+    dist/<name>/<name>.exe (Windows) or dist/<name>/<name> (Linux/Mac),
+    zipped to dist/<name>.zip for distribution
+
+One-folder builds start without unpacking the runtime to a temp directory,
+which a one-file build does on every invocation (i.e. every track).
+The analyzer is defined by truedat-analyze.spec, which keeps plotting and
+GUI modules out of the bundle; visualize.py is built as its own target.
+Binaries are UPX-compressed only when UPX_DIR points at upx (opt-in: it
+shrinks the download but adds decompression to every launch).
 
 Prerequisites:
-    pip install pyinstaller essentia numpy
+    pip install -r requirements.txt
 """
 
+import shutil
 import subprocess
 import sys
 import os
 
+TARGETS = ("analyze", "visualize")
+
+
 def main():
+    target = sys.argv[1] if len(sys.argv) > 1 else "analyze"
+    if target not in TARGETS:
+        print(f"Usage: python build.py [{'|'.join(TARGETS)}]")
+        sys.exit(1)
+
     # Get the directory containing this script
     script_dir = os.path.dirname(os.path.abspath(__file__))
     src_dir = os.path.join(script_dir, "src")
-    analyze_py = os.path.join(src_dir, "analyze.py")
+    source_py = os.path.join(src_dir, f"{target}.py")
+    name = f"truedat-{target}"
 
-    if not os.path.exists(analyze_py):
-        print(f"Error: {analyze_py} not found")
+    if not os.path.exists(source_py):
+        print(f"Error: {source_py} not found")
         sys.exit(1)
 
-    # PyInstaller command for single-file executable
+    dist_dir = os.path.join(script_dir, "dist")
+
     cmd = [
         sys.executable, "-m", "PyInstaller",
-        "--onefile",                    # Single executable
-        "--name", "truedat-analyze",    # Output name (called by truedat.exe)
-        "--distpath", os.path.join(script_dir, "dist"),
+        "--noconfirm",                  # Replace the previous dist folder
+        "--distpath", dist_dir,
         "--workpath", os.path.join(script_dir, "build"),
-        "--specpath", script_dir,
-        # Hidden imports that PyInstaller might miss
-        "--hidden-import", "essentia",
-        "--hidden-import", "essentia.standard",
-        "--hidden-import", "numpy",
-        # Collect all essentia data files (models, etc.)
-        "--collect-all", "essentia",
-        analyze_py
     ]
 
-    print("Building Truedat with PyInstaller...")
+    # UPX is opt-in; otherwise PyInstaller would use any upx on PATH
+    upx_dir = os.environ.get("UPX_DIR")
+    if upx_dir:
+        cmd += ["--upx-dir", upx_dir]
+    elif target != "analyze":
+        cmd.append("--noupx")           # The spec decides for the analyzer
+
+    if target == "analyze":
+        # Bundle contents, excludes and stripping live in the spec
+        cmd.append(os.path.join(script_dir, f"{name}.spec"))
+    else:
+        # PyInstaller command for one-folder executable
+        cmd += [
+            "--name", name,
+            "--specpath", os.path.join(script_dir, "build"),
+        ]
+        # Strip symbols from bundled binaries (no strip tool on Windows)
+        if sys.platform != "win32":
+            cmd.append("--strip")
+        cmd.append(source_py)
+
+    print(f"Building {name} with PyInstaller...")
     print(f"Command: {' '.join(cmd)}")
     print()
 
     result = subprocess.run(cmd, cwd=script_dir)
 
     if result.returncode == 0:
+        app_dir = os.path.join(dist_dir, name)
         if sys.platform == "win32":
-            exe_path = os.path.join(script_dir, "dist", "truedat.exe")
+            exe_path = os.path.join(app_dir, f"{name}.exe")
         else:
-            exe_path = os.path.join(script_dir, "dist", "truedat")
+            exe_path = os.path.join(app_dir, name)
 
         if os.path.exists(exe_path):
-            size_mb = os.path.getsize(exe_path) / (1024 * 1024)
+            zip_path = shutil.make_archive(app_dir, "zip", dist_dir, name)
+            size_mb = os.path.getsize(zip_path) / (1024 * 1024)
             print(f"\nSuccess! Executable created: {exe_path}")
-            print(f"Size: {size_mb:.1f} MB")
+            print(f"Archive: {zip_path} ({size_mb:.1f} MB)")
         else:
             print("\nBuild completed but executable not found at expected location")
     else:
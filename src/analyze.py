@@ -4,7 +4,12 @@ Truedat Analyzer - Audio feature extractor for mood vectors
 Uses Essentia to compute valence/arousal mood vectors.
 
 Usage: python analyze.py <audio_file_path>
+       python analyze.py <directory | audio_file_path>...
 Output: JSON with BPM, key, mode, valence, arousal, spectral features
+        (batch mode: one JSON object per line, each with its "path")
+
+Raw features are cached in ~/.cache/truedat (override with TRUEDAT_CACHE,
+set it empty to disable), so re-runs after formula changes skip Essentia.
 
 This software uses Essentia (https://essentia.upf.edu/), licensed under AGPL-3.0.
 Copyright (c) Music Technology Group, Universitat Pompeu Fabra.
@@ -15,125 +20,640 @@ Citation:
     International Society for Music Information Retrieval Conference (ISMIR'13).
 """
 
+import essentia
 import essentia.standard as es
+import hashlib
 import json
+import multiprocessing
 import numpy as np
+import os
+import queue
 import sys
+import threading
+import zipfile
+from numpy.lib.stride_tricks import sliding_window_view
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Analysis rate and framing. 16 kHz is all the mood features need and is
+# what the EffNet embedding model expects, so one decode serves everything.
+SAMPLE_RATE = 16000
+FRAME_SIZE = 512
+HOP_SIZE = 256
+
+# High-level mood models (Discogs-EffNet embeddings + classification heads).
+# Download from https://essentia.upf.edu/models.html into a "models" folder
+# next to this script, or point TRUEDAT_MODELS at the folder.
+MODEL_DIR = os.environ.get(
+    "TRUEDAT_MODELS",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "models"))
+EFFNET_MODEL = "discogs-effnet-bs64-1.pb"
+VALENCE_MODEL = "mood_happy-discogs-effnet-1.pb"        # [happy, non_happy]
+ENERGY_MODEL = "mood_aggressive-discogs-effnet-1.pb"    # [aggressive, not_aggressive]
+
+# Let batch workers and the inference thread share one GPU instead of the
+# first TensorFlow session reserving all of its memory
+os.environ.setdefault("TF_FORCE_GPU_ALLOW_GROWTH", "true")
+
+# Raw-feature cache, keyed by file content. Bump CACHE_VERSION whenever
+# feature extraction changes so stale entries are not reused.
+CACHE_DIR = os.environ.get(
+    "TRUEDAT_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "truedat"))
+CACHE_VERSION = 3
+
+# Files handed to a batch worker at a time; each worker reads the next file
+# of its chunk from disk while analyzing the current one
+PREFETCH_CHUNK = 8
+
+# File types picked up when a directory is given on the command line
+AUDIO_EXTENSIONS = (".mp3", ".flac", ".m4a", ".aac", ".ogg", ".opus", ".wav", ".aiff", ".wma")
 
 
 def normalize(x, min_val, max_val):
-    """Normalize value to [0, 1] range."""
-    return (x - min_val) / (max_val - min_val + 1e-9)
+    """Normalize value to [0, 1] range (as a plain float)."""
+    return float((x - min_val) / (max_val - min_val + 1e-9))
+
 
+def clamp(x):
+    """Clamp value to [0, 1] range, on a plain float."""
+    x = float(x)
+    return 0.0 if x < 0.0 else (1.0 if x > 1.0 else x)
 
-def clamp(x, min_val=0.0, max_val=1.0):
-    """Clamp value to range."""
-    return max(min_val, min(max_val, x))
 
+# Essentia algorithms reused across tracks. Constructing them allocates FFT
+# plans, window tables and filter banks, so each is built once per process
+# (eagerly in batch workers, lazily otherwise) rather than once per file.
+_ALGORITHMS = {
+    "bpm": lambda: es.PercivalBpmEstimator(sampleRate=SAMPLE_RATE),
+    "mfcc": lambda: es.MFCC(inputSize=FRAME_SIZE // 2 + 1, sampleRate=SAMPLE_RATE,
+                            highFrequencyBound=SAMPLE_RATE / 2),
+    "key": lambda: es.KeyExtractor(sampleRate=SAMPLE_RATE),
+}
+_instances = {}
 
-def compute_valence(mode, spectral_centroid, valence_model, mfccs):
+
+def _algorithm(name):
+    """Return this process's instance of a configured Essentia algorithm."""
+    algo = _instances.get(name)
+    if algo is None:
+        algo = _instances[name] = _ALGORITHMS[name]()
+    else:
+        algo.reset()
+    return algo
+
+
+def _mood(mode_flag, cent_n, val_model, mfccs, bpm_n, loud_n, flux_n, eng_model):
     """
-    Compute valence (positivity/happiness) from audio features.
+    Compute the (valence, arousal) mood vector from normalized features.
 
-    Formula:
+    Formulas:
     valence = 0.35·mode_major + 0.25·spectral_centroid + 0.20·valence_model + 0.20·mfcc_brightness
+    arousal = 0.4·BPM + 0.3·loudness + 0.2·spectral_flux + 0.1·energy_model
+
+    mfcc_brightness is the mean of the first five MFCCs. Plain float
+    arithmetic: a handful of multiply-adds per track costs less than
+    importing and dispatching a JIT kernel in every analyzer process.
     """
-    mode_flag = 1 if mode == "major" else 0
-    mfcc_brightness = np.mean(mfccs[:5])
+    m = mfccs[:5].tolist()
+    mfcc_bright = (m[0] + m[1] + m[2] + m[3] + m[4]) * 0.2
 
-    return clamp(
-        0.35 * mode_flag +
-        0.25 * spectral_centroid +
-        0.20 * valence_model +
-        0.20 * mfcc_brightness
-    )
+    v = 0.35 * mode_flag + 0.25 * cent_n + 0.20 * val_model + 0.20 * mfcc_bright
+    a = 0.4 * bpm_n + 0.3 * loud_n + 0.2 * flux_n + 0.1 * eng_model
+    return clamp(v), clamp(a)
 
 
-def compute_arousal(bpm, loudness, spectral_flux, energy_model):
+def compute_spectral(audio):
     """
-    Compute arousal (energy/intensity) from audio features.
+    Compute loudness (dB) and frame-averaged spectral centroid, spectral
+    flux and MFCCs.
 
-    Formula:
-    arousal = 0.4·BPM + 0.3·loudness + 0.2·spectral_flux + 0.1·energy_model
+    The whole signal is framed and transformed with one vectorized rfft;
+    centroid and flux are reduced from the spectrogram with whole-array
+    NumPy operations, and MFCC reads the same spectra, so each frame is
+    transformed only once.
     """
-    return clamp(
-        0.4 * bpm +
-        0.3 * loudness +
-        0.2 * spectral_flux +
-        0.1 * energy_model
-    )
+    loudness = float(10.0 * np.log10(np.mean(np.square(audio, dtype=np.float64)) + 1e-12))
 
+    if len(audio) < FRAME_SIZE:
+        audio = np.pad(audio, (0, FRAME_SIZE - len(audio)))
 
-def analyze(path):
+    # Hann window scaled like Essentia's normalized Windowing
+    window = np.hanning(FRAME_SIZE).astype(np.float32)
+    window *= 2.0 / window.sum()
+
+    # (num_frames, n_bins) magnitudes
+    frames = sliding_window_view(audio, FRAME_SIZE)[::HOP_SIZE]
+    spec_frames = np.abs(np.fft.rfft(frames * window, axis=1)).astype(np.float32)
+    freqs = np.arange(spec_frames.shape[1], dtype=np.float32) * SAMPLE_RATE / FRAME_SIZE
+
+    totals = spec_frames.sum(axis=1)
+    centroids = (spec_frames @ freqs) / np.maximum(totals, 1e-12)
+    centroid = float(centroids.mean())
+    flux = 0.0
+    if len(spec_frames) > 1:
+        flux = float(np.linalg.norm(np.diff(spec_frames, axis=0), axis=1).mean())
+
+    mfcc = _algorithm("mfcc")
+    mfcc_sum = np.zeros(13, dtype=np.float32)
+    for spec in spec_frames:
+        mfcc_sum += mfcc(spec)[1]
+
+    return loudness, centroid, flux, mfcc_sum / len(spec_frames)
+
+
+def _check_models():
     """
-    Analyze an audio file and extract mood features (valence, arousal).
+    Return True if the high-level models can run: Essentia was built with
+    TensorFlow (essentia-tensorflow) and every model graph is in MODEL_DIR.
+    """
+    if not (hasattr(es, "TensorflowPredictEffnetDiscogs") and hasattr(es, "TensorflowPredict2D")):
+        return False
+    return all(os.path.exists(os.path.join(MODEL_DIR, name))
+               for name in (EFFNET_MODEL, VALENCE_MODEL, ENERGY_MODEL))
 
-    Returns dict with:
-    - bpm, loudness, spectral_centroid, spectral_flux
-    - key, mode (major/minor)
-    - valence (0-1), arousal (0-1)
+
+# Probed once at import: without TensorFlow support or the model graphs the
+# high-level inputs fall back to 0.5 up front instead of failing (and being
+# caught) on every file
+HAS_HIGHLEVEL = _check_models()
+
+# What Essentia raises from algorithm configure/compute (C++
+# EssentiaException surfaces as RuntimeError)
+ESSENTIA_ERRORS = (RuntimeError, essentia.EssentiaError)
+
+_effnet = None
+_heads = None
+
+
+def _warn(message):
+    """Report a degraded (but non-fatal) analysis on stderr."""
+    print(f"Warning: {message}", file=sys.stderr)
+
+
+def _load_effnet():
     """
-    # Load audio
-    loader = es.MonoLoader(filename=path)
-    audio = loader()
+    Load the EffNet embedding graph once per process.
 
-    # Core rhythm features
-    rhythm = es.RhythmExtractor2013()(audio)
-    bpm = rhythm[0]
+    Batch workers load it in their initializer. Only called when
+    HAS_HIGHLEVEL; raises ESSENTIA_ERRORS if the graph cannot be loaded.
+    """
+    global _effnet
+    if _effnet is None:
+        _effnet = es.TensorflowPredictEffnetDiscogs(
+            graphFilename=os.path.join(MODEL_DIR, EFFNET_MODEL),
+            output="PartitionedCall:1")
+    return _effnet
 
-    # Loudness and spectral features
-    loudness = es.Loudness()(audio)
-    spectral_centroid = es.Centroid()(audio)
-    spectral_flux = es.Flux()(audio)
 
-    # MFCCs for timbre
-    mfcc = es.MFCC()(audio)[1]
+def _load_heads():
+    """
+    Load the mood classification graphs once per process.
 
-    # Key and mode (major/minor)
-    key, scale, strength = es.KeyExtractor()(audio)
+    They run wherever the embeddings are collected (the batch parent never
+    needs EffNet itself). Raises ESSENTIA_ERRORS like _load_effnet.
+    """
+    global _heads
+    if _heads is None:
+        _heads = (
+            es.TensorflowPredict2D(
+                graphFilename=os.path.join(MODEL_DIR, VALENCE_MODEL),
+                output="model/Softmax"),
+            es.TensorflowPredict2D(
+                graphFilename=os.path.join(MODEL_DIR, ENERGY_MODEL),
+                output="model/Softmax"),
+        )
+    return _heads
+
+
+def compute_embedding(audio):
+    """
+    Compute a track's Discogs-EffNet embedding from a decoded 16 kHz buffer.
+
+    Averages the per-patch embeddings into one float32 vector.
+    """
+    return _load_effnet()(audio).mean(axis=0).astype(np.float32)
+
+
+def _infer_highlevel(embeddings_batch):
+    """
+    Run the mood heads over a stack of track embeddings in one call each.
+
+    Takes an (N, 1280) array and returns (valence_model,
+    energy_model) arrays of positive-class probabilities, one per track.
+    """
+    valence_head, energy_head = _load_heads()
+
+    batch = np.ascontiguousarray(embeddings_batch, dtype=np.float32)
+    return valence_head(batch)[:, 0], energy_head(batch)[:, 0]
+
+
+def _cache_key(path):
+    """Hash the first MiB and the size of a file (BLAKE2b, 128-bit hex)."""
+    with open(path, "rb") as f:
+        head = f.read(1 << 20)
+    tail = f"{os.path.getsize(path)}:{CACHE_VERSION}".encode()
+    return hashlib.blake2b(head + tail, digest_size=16).hexdigest()
+
+
+def _cache_path(key):
+    return os.path.join(CACHE_DIR, f"{key}.npz")
+
+
+def _load_cached(key):
+    """Return the cached raw features for a cache key, or None on a miss."""
+    try:
+        with np.load(_cache_path(key)) as data:
+            features = {
+                "bpm": float(data["bpm"]),
+                "loudness": float(data["loudness"]),
+                "spectral_centroid": float(data["spectral_centroid"]),
+                "spectral_flux": float(data["spectral_flux"]),
+                "mfcc": data["mfcc"],
+                "key": str(data["key"]),
+                "scale": str(data["scale"]),
+                "embedding": data["embedding"] if "embedding" in data.files else None,
+            }
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        return None
 
-    # Essentia high-level models (if available)
+    # Cached before the embedding model was installed: recompute
+    if features["embedding"] is None and HAS_HIGHLEVEL:
+        return None
+    return features
+
+
+def _save_cached(key, features):
+    """Write raw features to the cache; a failed write only costs the cache."""
+    arrays = {name: value for name, value in features.items() if value is not None}
+    path = _cache_path(key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
     try:
-        music_extractor = es.MusicExtractor()
-        high = music_extractor(path)
-        energy_model = high['lowlevel.spectral_energy']
-        valence_model = high['highlevel.valence.all']['mean']
-    except:
-        # Fallback if high-level models not available
-        energy_model = 0.5
-        valence_model = 0.5
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp_path, path)
+    except OSError:
+        # Don't leave a partial file behind (e.g. after a full disk)
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def _lookup_cached(path):
+    """Return (cache key, cached features or None); the key is None when caching is off."""
+    key = _cache_key(path) if CACHE_DIR else None
+    return key, (_load_cached(key) if key is not None else None)
+
+
+def load_audio(path):
+    """Decode an audio file to a mono 16 kHz float32 buffer."""
+    return es.MonoLoader(filename=path, sampleRate=SAMPLE_RATE, resampleQuality=1)()
+
+
+def extract_features(path):
+    """
+    Extract the raw (pre-formula) features of an audio file.
+
+    Served from the on-disk cache when the file's content is unchanged;
+    otherwise decodes the file and caches the result. Returns the dict
+    described in extract_features_from_audio().
+    """
+    key, features = _lookup_cached(path)
+    if features is None:
+        features = extract_features_from_audio(load_audio(path))
+        if key is not None:
+            _save_cached(key, features)
+    return features
+
+
+def extract_features_from_audio(audio):
+    """
+    Extract the raw (pre-formula) features of a decoded 16 kHz audio buffer.
+
+    Returns dict with bpm, loudness, spectral_centroid, spectral_flux, mfcc,
+    key, scale and the track embedding (None if the model is unavailable).
+    """
+    # Tempo only: beat positions and confidences are never used, so skip
+    # beat tracking (RhythmExtractor*) for the BPM-only estimator
+    bpm = _algorithm("bpm")(audio)
+
+    # Loudness, spectral features and MFCCs (timbre), averaged over frames
+    loudness, spectral_centroid, spectral_flux, mfcc = compute_spectral(audio)
+
+    # Key and mode (major/minor)
+    key, scale, strength = _algorithm("key")(audio)
+
+    # Embedding for the high-level models (if available), from the same buffer
+    embedding = None
+    if HAS_HIGHLEVEL:
+        try:
+            embedding = compute_embedding(audio)
+        except ESSENTIA_ERRORS as e:
+            _warn(f"embedding model failed, using neutral mood inputs: {e}")
+
+    return {
+        "bpm": bpm,
+        "loudness": loudness,
+        "spectral_centroid": spectral_centroid,
+        "spectral_flux": spectral_flux,
+        "mfcc": mfcc,
+        "key": key,
+        "scale": scale,
+        "embedding": embedding,
+    }
+
+
+def compute_mood(features, valence_model=0.5, energy_model=0.5):
+    """
+    Combine raw features and high-level model outputs into the result dict.
+
+    Returns dict with:
+    - bpm, loudness, spectral_centroid, spectral_flux
+    - key, mode (major/minor)
+    - valence (0-1), arousal (0-1)
+    """
+    bpm = features["bpm"]
+    loudness = features["loudness"]
+    spectral_centroid = features["spectral_centroid"]
+    spectral_flux = features["spectral_flux"]
+    scale = features["scale"]
 
     # Normalize features to [0, 1]
     bpm_n = normalize(bpm, 60, 200)
     loud_n = normalize(loudness, -60, 0)
-    cent_n = normalize(spectral_centroid, 500, 5000)
+    cent_n = normalize(spectral_centroid, 400, 3500)    # 8 kHz Nyquist at 16 kHz
     flux_n = normalize(spectral_flux, 0, 1)
 
     # Compute mood vector
-    arousal = compute_arousal(bpm_n, loud_n, flux_n, energy_model)
-    valence = compute_valence(scale, cent_n, valence_model, mfcc)
+    valence, arousal = _mood(
+        1.0 if scale == "major" else 0.0, cent_n, float(valence_model), features["mfcc"],
+        bpm_n, loud_n, flux_n, float(energy_model))
 
     return {
         "bpm": round(float(bpm), 1),
         "loudness": round(float(loudness), 2),
         "spectral_centroid": round(float(spectral_centroid), 1),
         "spectral_flux": round(float(spectral_flux), 3),
-        "key": key,
+        "key": features["key"],
         "mode": scale,
         "valence": round(float(valence), 3),
         "arousal": round(float(arousal), 3)
     }
 
 
+def analyze(path):
+    """
+    Analyze an audio file and extract mood features (valence, arousal).
+
+    Returns the dict described in compute_mood().
+    """
+    features = extract_features(path)
+
+    # Essentia high-level models (if available), as a batch of one
+    valence_model, energy_model = 0.5, 0.5
+    if HAS_HIGHLEVEL and features["embedding"] is not None:
+        try:
+            valence, energy = _infer_highlevel(features["embedding"][np.newaxis])
+            valence_model, energy_model = float(valence[0]), float(energy[0])
+        except ESSENTIA_ERRORS as e:
+            _warn(f"mood models failed, using neutral mood inputs: {e}")
+
+    return compute_mood(features, valence_model, energy_model)
+
+
+def write_json(obj, stream=None):
+    """
+    Write obj as one line of JSON to a text stream (stdout by default).
+
+    Uses orjson, which serializes NumPy scalars and arrays natively, when
+    installed; the stdlib fallback converts them with .tolist(). Lines orjson
+    rejects (strings with lone surrogates, i.e. undecodable filenames from
+    os.walk) go through the stdlib too, which escapes them.
+    """
+    stream = stream or sys.stdout
+    line = None
+    if orjson is not None:
+        try:
+            line = orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE)
+        except orjson.JSONEncodeError:
+            pass
+    if line is None:
+        line = (json.dumps(obj, separators=(",", ":"), default=lambda o: o.tolist()) + "\n").encode()
+    stream.flush()
+    stream.buffer.write(line)
+    stream.buffer.flush()
+
+
+def find_audio_files(directory):
+    """Recursively list audio files under a directory, in a stable order."""
+    found = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(AUDIO_EXTENSIONS):
+                found.append(os.path.join(root, name))
+    return found
+
+
+def _init_worker():
+    """Pool initializer: build per-process state once, before the first file."""
+    for name in _ALGORITHMS:
+        _algorithm(name)
+    if HAS_HIGHLEVEL:
+        try:
+            _load_effnet()
+        except ESSENTIA_ERRORS as e:
+            _warn(f"embedding model failed to load: {e}")
+
+
+def _extract_path(path):
+    """Extract one file's features for batch mode; errors are reported, not raised."""
+    try:
+        return path, extract_features(path), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+def _prefetch(path):
+    """
+    Read a file through once so the worker's decode hits the page cache.
+
+    Runs on a helper thread while the worker analyzes the previous file:
+    plain file reads (and hashing the cache key) release the GIL, unlike
+    MonoLoader. Files already in the feature cache stop at the first MiB
+    that _cache_key reads.
+    """
+    try:
+        if CACHE_DIR and os.path.exists(_cache_path(_cache_key(path))):
+            return
+        with open(path, "rb", buffering=0) as f:
+            buffer = bytearray(1 << 20)
+            while f.readinto(buffer):
+                pass
+    except OSError:
+        pass
+
+
+def _extract_chunk(paths):
+    """
+    Extract a chunk of files in order for batch mode, reading each next file
+    from disk on a helper thread while the current one is analyzed.
+    """
+    results = []
+    prefetch = None
+    for i, path in enumerate(paths):
+        if prefetch is not None:
+            prefetch.join()
+            prefetch = None
+        if i + 1 < len(paths):
+            prefetch = threading.Thread(target=_prefetch, args=(paths[i + 1],), daemon=True)
+            prefetch.start()
+        results.append(_extract_path(path))
+    return results
+
+
+def _finish_batch(batch):
+    """
+    Run the mood heads over a batch of extracted tracks and write their NDJSON lines.
+
+    Returns the number of tracks that failed (written as errors, or not
+    written at all). If the mood models fail the batch falls back to neutral
+    mood inputs; any other failure marks every track in the batch as failed
+    instead of dropping it.
+    """
+    try:
+        ready = []
+        if HAS_HIGHLEVEL:
+            ready = [i for i, (_, features) in enumerate(batch) if features["embedding"] is not None]
+        valence_models = np.full(len(batch), 0.5, dtype=np.float32)
+        energy_models = np.full(len(batch), 0.5, dtype=np.float32)
+
+        if ready:
+            try:
+                valence, energy = _infer_highlevel(
+                    np.stack([batch[i][1]["embedding"] for i in ready]))
+                valence_models[ready] = valence
+                energy_models[ready] = energy
+            except ESSENTIA_ERRORS as e:
+                _warn(f"mood models failed for {len(ready)} tracks, using neutral mood inputs: {e}")
+
+        results = [
+            {"path": path, **compute_mood(features, float(valence_model), float(energy_model))}
+            for (path, features), valence_model, energy_model
+            in zip(batch, valence_models, energy_models)
+        ]
+    except Exception as e:
+        results = [{"path": path, "error": f"mood computation failed: {e}"} for path, _ in batch]
+
+    failed = 0
+    for result in results:
+        try:
+            write_json(result)
+        except Exception as e:
+            # Output itself failed (e.g. stdout closed); count the lost line
+            _warn(f"could not write the result for {result['path']}: {e}")
+            failed += 1
+        else:
+            failed += "error" in result
+    return failed
+
+
+def _inference_consumer(pending, batch_size, failed):
+    """
+    Pull extracted tracks off the queue and finish them batch_size at a time.
+
+    This thread writes all batch output, so failed files are reported here too.
+    Tracks that fail after extraction are added to failed[0]; a failed write
+    only loses its own line, and the thread keeps draining the queue until
+    the None sentinel.
+    """
+    batch = []
+    while True:
+        item = pending.get()
+        if item is not None:
+            path, features, error = item
+            if error is None:
+                batch.append((path, features))
+            else:
+                try:
+                    write_json({"path": path, "error": error})
+                except Exception as e:
+                    _warn(f"could not write the error for {path}: {e}")
+        if batch and (item is None or len(batch) >= batch_size):
+            failed[0] += _finish_batch(batch)
+            batch = []
+        if item is None:
+            return
+
+
+def analyze_batch(paths, processes=None, batch_size=64):
+    """
+    Analyze many files across a process pool, writing NDJSON to stdout.
+
+    Essentia is not thread-safe, so feature extraction is parallel per
+    process. Workers stop at the track embedding; a single consumer thread
+    in this process stacks the embeddings and runs the mood heads batch_size
+    tracks at a time (on the GPU when Essentia's TensorFlow build finds one).
+    Each worker takes PREFETCH_CHUNK files at a time and reads the next one
+    ahead from disk while the current one is analyzed. Output order differs from input order. Returns the number of files that failed.
+    """
+    errors = 0
+    failed = [0]    # tracks the consumer could not finish
+    pending = queue.Queue()
+
+    # Spawned workers: a replacement worker forked from this process would
+    # inherit the consumer thread and TensorFlow's threads mid-flight
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes=processes or os.cpu_count(),
+                      initializer=_init_worker) as pool:
+        consumer = threading.Thread(target=_inference_consumer,
+                                    args=(pending, batch_size, failed))
+        consumer.start()
+        try:
+            chunks = [paths[i:i + PREFETCH_CHUNK] for i in range(0, len(paths), PREFETCH_CHUNK)]
+            for results in pool.imap_unordered(_extract_chunk, chunks):
+                for item in results:
+                    if item[2] is not None:
+                        errors += 1
+                    pending.put(item)
+        finally:
+            pending.put(None)
+            consumer.join()
+
+    return errors + failed[0]
+
+
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
+
     if len(sys.argv) < 2:
         print("Usage: python analyze.py <audio_file_path>", file=sys.stderr)
+        print("       python analyze.py <directory | audio_file_path>...", file=sys.stderr)
         sys.exit(1)
 
-    path = sys.argv[1]
-    try:
-        result = analyze(path)
-        print(json.dumps(result))
-    except Exception as e:
-        print(json.dumps({"error": str(e)}), file=sys.stderr)
-        sys.exit(1)
+    if not HAS_HIGHLEVEL:
+        _warn(f"high-level models unavailable (needs essentia-tensorflow and the graphs in "
+              f"{MODEL_DIR}), using neutral mood inputs (0.5)")
+
+    # Single file: one JSON object on stdout, as called per track by truedat.exe
+    if len(sys.argv) == 2 and not os.path.isdir(sys.argv[1]):
+        path = sys.argv[1]
+        try:
+            result = analyze(path)
+            write_json(result)
+        except Exception as e:
+            write_json({"error": str(e)}, sys.stderr)
+            sys.exit(1)
+        sys.exit(0)
+
+    # Batch: directories expand to the audio files beneath them
+    paths = []
+    for arg in sys.argv[1:]:
+        paths.extend(find_audio_files(arg) if os.path.isdir(arg) else [arg])
+
+    sys.exit(1 if analyze_batch(paths) else 0)
@@ -5,35 +5,76 @@ Visualize the mood map of your library (Energy and Vibe).
 Usage: python visualize.py [mbxmoods.json]
 """
 
-import json
 import sys
 import matplotlib.pyplot as plt
+import numpy as np
+
+try:
+    import orjson as json_lib
+except ImportError:
+    import json as json_lib
+
+try:
+    from sklearn.cluster import MiniBatchKMeans
+except ImportError:
+    MiniBatchKMeans = None
+
+# Above this many tracks, plot density (hexbin) instead of individual points
+HEXBIN_THRESHOLD = 2000
+# Number of tracks to annotate on the map
+ANNOTATIONS = 20
 
 
 def load_trackdat(path):
-    """Load mbxmoods.json and extract valence/arousal."""
-    with open(path, "r") as f:
-        data = json.load(f)
-
-    tracks = []
-    for file_path, features in data.get("tracks", {}).items():
-        tracks.append({
-            "artist": features.get("artist", ""),
-            "title": features.get("title", ""),
-            "valence": features.get("valence", 0.5),
-            "arousal": features.get("arousal", 0.5)
-        })
-    return tracks
-
-
-def plot_mood_map(tracks):
-    """Plot the 2D mood map."""
-    valence = [t["valence"] for t in tracks]
-    arousal = [t["arousal"] for t in tracks]
-    labels = [f'{t["artist"]} - {t["title"]}' for t in tracks]
+    """
+    Load mbxmoods.json and extract valence/arousal.
+
+    Returns (valence, arousal, tracks): float32 arrays filled in a single
+    pass, plus the parsed per-track entries (for labelling on demand).
+    """
+    with open(path, "rb") as f:
+        data = json_lib.loads(f.read())
+
+    tracks = list(data.get("tracks", {}).values())
+    valence = np.empty(len(tracks), dtype=np.float32)
+    arousal = np.empty(len(tracks), dtype=np.float32)
+
+    for i, features in enumerate(tracks):
+        valence[i] = features.get("valence", 0.5)
+        arousal[i] = features.get("arousal", 0.5)
 
+    return valence, arousal, tracks
+
+
+def pick_annotations(valence, arousal, count=ANNOTATIONS):
+    """
+    Pick the indices of tracks worth labelling on the map.
+
+    With scikit-learn available, clusters the library into `count` groups and
+    returns the track nearest each cluster centre; otherwise `count` tracks
+    evenly spaced through the library.
+    """
+    n = len(valence)
+    if n <= count:
+        return list(range(n))
+    if MiniBatchKMeans is None:
+        return np.linspace(0, n - 1, count).astype(int).tolist()
+
+    points = np.column_stack([valence, arousal])
+    centres = MiniBatchKMeans(n_clusters=count, n_init=3, random_state=0).fit(points).cluster_centers_
+    nearest = {int(np.argmin(((points - c) ** 2).sum(axis=1))) for c in centres}
+    return sorted(nearest)
+
+
+def plot_mood_map(valence, arousal, tracks):
+    """Plot the 2D mood map."""
     plt.figure(figsize=(10, 10))
-    plt.scatter(valence, arousal, alpha=0.6, c=arousal, cmap='RdYlGn')
+    if len(valence) > HEXBIN_THRESHOLD:
+        plt.hexbin(valence, arousal, gridsize=80, cmap='RdYlGn', mincnt=1, extent=(0, 1, 0, 1))
+        colorbar_label = "Tracks"
+    else:
+        plt.scatter(valence, arousal, alpha=0.6, c=arousal, cmap='RdYlGn')
+        colorbar_label = "Vibe"
 
     plt.xlabel("Mood (dark ← → bright)")
     plt.ylabel("Vibe (chill ← → hype)")
@@ -45,21 +86,23 @@ def plot_mood_map(tracks):
     plt.text(0.1, 0.1, "Sad/Bored", fontsize=10, alpha=0.5)
     plt.text(0.8, 0.1, "Calm/Relaxed", fontsize=10, alpha=0.5)
 
-    # Annotate some points
-    step = max(1, len(labels) // 30)
-    for i in range(0, len(labels), step):
-        plt.annotate(labels[i], (valence[i], arousal[i]), fontsize=6, alpha=0.7)
+    # Annotate a representative track per region of the map (labels are
+    # only built for the annotated tracks)
+    for i in pick_annotations(valence, arousal):
+        t = tracks[i]
+        plt.annotate(f'{t.get("artist", "")} - {t.get("title", "")}',
+                     (valence[i], arousal[i]), fontsize=6, alpha=0.7)
 
     plt.xlim(0, 1)
     plt.ylim(0, 1)
     plt.grid(True, alpha=0.3)
-    plt.colorbar(label="Vibe")
+    plt.colorbar(label=colorbar_label)
     plt.tight_layout()
     plt.show()
 
 
 if __name__ == "__main__":
     path = sys.argv[1] if len(sys.argv) > 1 else "mbxmoods.json"
-    tracks = load_trackdat(path)
+    valence, arousal, tracks = load_trackdat(path)
     print(f"Loaded {len(tracks)} tracks")
-    plot_mood_map(tracks)
+    plot_mood_map(valence, arousal, tracks)
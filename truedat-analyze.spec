@@ -0,0 +1,91 @@
+# -*- mode: python ; coding: utf-8 -*-
+"""
+PyInstaller spec for truedat-analyze (the one-folder analyzer bundle).
+
+Built by build.py; run directly with:
+    python -m PyInstaller truedat-analyze.spec
+"""
+
+import os
+import sys
+from PyInstaller.utils.hooks import collect_all
+
+src_dir = os.path.join(SPECPATH, "src")
+
+# Collect all essentia data files and binaries (models, etc.)
+datas, binaries, hiddenimports = collect_all("essentia")
+
+# Hidden imports that PyInstaller might miss
+hiddenimports += ["essentia", "essentia.standard", "numpy"]
+
+# High-level mood models (src/models/*.pb), looked up next to analyze.py
+models_dir = os.path.join(src_dir, "models")
+if os.path.isdir(models_dir):
+    datas.append((models_dir, "models"))
+
+# Modules auto-detection drags in that analyze.py never imports
+# (plotting and notebooks are only used by visualize.py and development)
+excludes = [
+    "matplotlib",
+    "tkinter",
+    "_tkinter",
+    "PIL",
+    "IPython",
+    "jupyter_client",
+    "pytest",
+    "sklearn",
+]
+
+# GUI toolkit libraries pulled in as binaries of transitive dependencies
+excluded_binaries = ("libQt", "Qt5", "Qt6", "libgtk", "libgdk")
+
+# Strip symbols from bundled binaries (no strip tool on Windows)
+strip = sys.platform != "win32"
+
+# UPX-compress bundled binaries only when asked for with UPX_DIR (see
+# build.py): compressed libraries are unpacked in memory on every launch,
+# and the analyzer launches once per track. Never for the ones UPX is known
+# to corrupt.
+upx = bool(os.environ.get("UPX_DIR"))
+upx_exclude = [
+    "vcruntime140.dll",
+    "vcruntime140_1.dll",
+    "_pywrap_tensorflow_internal.pyd",
+    "tensorflow.dll",
+    "libtensorflow.so.2",
+    "libtensorflow_framework.so.2",
+]
+
+a = Analysis(
+    [os.path.join(src_dir, "analyze.py")],
+    binaries=binaries,
+    datas=datas,
+    hiddenimports=hiddenimports,
+    excludes=excludes,
+)
+a.binaries = [b for b in a.binaries
+              if not os.path.basename(b[0]).startswith(excluded_binaries)]
+
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name="truedat-analyze",     # Output name (called by truedat.exe)
+    strip=strip,
+    upx=upx,
+    upx_exclude=upx_exclude,
+    console=True,
+)
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=strip,
+    upx=upx,
+    upx_exclude=upx_exclude,
+    name="truedat-analyze",
+)